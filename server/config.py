@@ -0,0 +1,46 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env file (once, for the whole server)
+load_dotenv()
+
+# Server configuration
+PORT = int(os.getenv("PORT", 8003))
+HOST = os.getenv("HOST", "0.0.0.0")
+DEBUG = os.getenv("DEBUG", "False").lower() == "true"
+
+# Number of uvicorn worker processes. Session state lives in the server process,
+# so more than one worker requires a shared session store.
+WORKERS = int(os.getenv("WORKERS", 1))
+
+# Number of threads available to sync endpoints and background tasks
+THREADPOOL_WORKERS = int(os.getenv("THREADPOOL_WORKERS", 16))
+
+# Upload configuration
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 10485760))  # 10MB default
+MAX_UPLOAD_SIZE_MB = MAX_UPLOAD_SIZE / 1024 / 1024
+
+# Maximum number of uploads written to disk at the same time.
+# This should track the disk write bandwidth rather than the CPU count.
+MAX_CONCURRENT_UPLOADS = int(os.getenv("MAX_CONCURRENT_UPLOADS", 4))
+
+# Number of worker processes used to extract pages of a PDF in parallel.
+# The default is capped, as each worker holds its own parsed copy of the PDF
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", min(os.cpu_count() or 1, 8)))
+
+# File storage
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
+TEMP_FOLDER = os.getenv("TEMP_FOLDER", "server/temp_files")
+
+# OCR configuration
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
+TESSERACT_LANGS = os.getenv("TESSERACT_LANGS", "eng+heb")
+
+# Number of images of a page that are OCRed at the same time (per worker process).
+# The default shares the CPUs between the PDF worker processes
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", max(1, (os.cpu_count() or 1) // max(PDF_WORKERS, 1))))
+
+# Security - allowed CORS origins, plus our own API server
+CORS_ORIGINS = tuple(
+    filter(None, os.getenv("CORS_ORIGINS", "http://localhost:3000").split(","))
+) + ("http://localhost:8003",)
@@ -1,20 +1,28 @@
 import os
 import uuid
-import json
+import asyncio
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
 from fastapi.responses import FileResponse
-from typing import Optional
-from starlette.status import HTTP_201_CREATED, HTTP_400_BAD_REQUEST
-from dotenv import load_dotenv
+from starlette.status import HTTP_201_CREATED, HTTP_400_BAD_REQUEST, HTTP_413_REQUEST_ENTITY_TOO_LARGE
 from pathlib import Path
+from server.config import MAX_UPLOAD_SIZE, MAX_UPLOAD_SIZE_MB, MAX_CONCURRENT_UPLOADS
+from server.utils import session_store
 
-# Load environment variables
-load_dotenv()
+# Size of the chunks used to stream uploads to disk
+UPLOAD_CHUNK_SIZE = 64 * 1024  # 64KB
 
-# Constants from environment variables
-MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 10485760))  # 10MB default
-UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
-TEMP_FOLDER = os.getenv("TEMP_FOLDER", "server/temp_files")
+# Allowance for the multipart boundaries and headers that wrap the uploaded file
+UPLOAD_FORM_OVERHEAD = 16 * 1024  # 16KB
+
+# Limits how many uploads are written to disk at the same time
+_UPLOAD_SEM = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+
+# Media types of the downloadable output formats
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+VALID_FORMATS = frozenset(MEDIA_TYPES)
 
 # Create router
 router = APIRouter()
@@ -27,46 +35,75 @@ class ConversionStatus:
     COMPLETED = "completed"
     ERROR = "error"
 
-# Helper functions
-def get_session_file_path(session_id: str) -> str:
-    """Get the path to the session status file"""
-    return os.path.join(TEMP_FOLDER, f"{session_id}.json")
+# State transitions performed by the pause/resume endpoints: action -> (from, to)
+STATUS_TRANSITIONS = {
+    "pause": (ConversionStatus.PROCESSING, ConversionStatus.PAUSED),
+    "resume": (ConversionStatus.PAUSED, ConversionStatus.PROCESSING),
+}
 
+# Helper functions
 def save_session_status(session_id: str, status: dict) -> None:
-    """Save session status to a JSON file"""
-    with open(get_session_file_path(session_id), "w") as f:
-        json.dump(status, f)
+    """Save session status to the session store"""
+    session_store.set(session_id, status)
 
 def get_session_status(session_id: str) -> dict:
-    """Get session status from a JSON file"""
-    status_file = get_session_file_path(session_id)
-    if not os.path.exists(status_file):
+    """Get session status from the session store"""
+    # Reject malformed IDs before they are used in any lookup or file path
+    if not session_store.is_valid_session_id(session_id):
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    with open(status_file, "r") as f:
-        return json.load(f)
+    try:
+        return session_store.get(session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+def update_session_status(session_id: str, fn) -> dict:
+    """
+    Read, modify and store a session status as one atomic step
+
+    See session_store.update; raises a 404 error if the session does not exist
+    """
+    if not session_store.is_valid_session_id(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        return session_store.update(session_id, fn)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+def transition_session(session_id: str, action: str) -> dict:
+    """
+    Move a session to the state reached by the given action
+
+    Raises a 400 error if the session is not in the state the action starts from
+    """
+    from_status, to_status = STATUS_TRANSITIONS[action]
+    
+    def apply_transition(status: dict) -> dict:
+        # Check if the action is allowed in the current state
+        if status["status"] != from_status:
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail=f"Cannot {action} conversion in {status['status']} status"
+            )
+        
+        # Update session status
+        status["status"] = to_status
+        return status
+    
+    return update_session_status(session_id, apply_transition)
 
 def validate_file(file: UploadFile) -> None:
-    """Validate file type and size"""
+    """
+    Validate the file type
+
+    The size limit is enforced with a 413 response, by the upload size limit
+    middleware and while the upload is written to disk
+    """
     # Check file type
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(
             status_code=HTTP_400_BAD_REQUEST,
             detail="Only PDF files are allowed"
         )
-    
-    # Get file size (FastAPI stores uploaded file in memory by default)
-    # We'll use a small read to check content type
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset file position
-    
-    # Check file size
-    if file_size > MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=HTTP_400_BAD_REQUEST,
-            detail=f"File size exceeds maximum allowed ({MAX_UPLOAD_SIZE/1024/1024:.1f}MB)"
-        )
 
 # Endpoints
 @router.post("/upload", status_code=HTTP_201_CREATED)
@@ -80,21 +117,34 @@ async def upload_file(file: UploadFile = File(...)):
     validate_file(file)
     
     # Generate a unique session ID
-    session_id = str(uuid.uuid4())
-    
-    # Create directory if it doesn't exist
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    session_id = uuid.uuid4().hex
     
     # Save the file
-    file_path = os.path.join(UPLOAD_FOLDER, f"{session_id}.pdf")
-    with open(file_path, "wb") as f:
-        contents = await file.read()
-        f.write(contents)
+    file_path = session_store.get_upload_file_path(session_id)
+    # Stream the upload in fixed-size chunks so memory use doesn't grow with the PDF,
+    # enforcing the size limit as we go
+    written = 0
+    async with _UPLOAD_SEM:
+        with open(file_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > MAX_UPLOAD_SIZE:
+                    break
+                f.write(chunk)
+    
+    if written > MAX_UPLOAD_SIZE:
+        os.unlink(file_path)
+        raise HTTPException(
+            status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File size exceeds maximum allowed ({MAX_UPLOAD_SIZE_MB:.1f}MB)"
+        )
     
     # Initialize session status
     status = {
         "session_id": session_id,
         "filename": file.filename,
+        # Original filename without extension, used to name the download
+        "base_name": os.path.splitext(file.filename)[0],
         "status": ConversionStatus.PENDING,
         "progress": 0,
         "current_page": 0,
@@ -110,7 +160,7 @@ async def upload_file(file: UploadFile = File(...)):
     return {"session_id": session_id, "status": status["status"]}
 
 @router.post("/start/{session_id}")
-async def start_conversion(
+def start_conversion(
     session_id: str, 
     background_tasks: BackgroundTasks,
     output_format: str = Form(...),
@@ -122,24 +172,27 @@ async def start_conversion(
     - output_format: Output format ('csv' or 'xlsx')
     """
     # Validate output format
-    if output_format not in ["csv", "xlsx"]:
+    if output_format not in VALID_FORMATS:
         raise HTTPException(
             status_code=HTTP_400_BAD_REQUEST,
             detail="Invalid output format. Use 'csv' or 'xlsx'"
         )
     
-    # Get current session status
-    status = get_session_status(session_id)
+    # Check the session exists
+    get_session_status(session_id)
     
     # Check if file exists
-    file_path = os.path.join(UPLOAD_FOLDER, f"{session_id}.pdf")
+    file_path = session_store.get_upload_file_path(session_id)
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
     
     # Update session status
-    status["status"] = ConversionStatus.PROCESSING
-    status["output_format"] = output_format
-    save_session_status(session_id, status)
+    def apply_start(status: dict) -> dict:
+        status["status"] = ConversionStatus.PROCESSING
+        status["output_format"] = output_format
+        return status
+    
+    status = update_session_status(session_id, apply_start)
     
     # Start conversion in background
     from server.utils.converter import start_conversion_task
@@ -148,48 +201,24 @@ async def start_conversion(
     return {"session_id": session_id, "status": status["status"]}
 
 @router.post("/pause/{session_id}")
-async def pause_conversion(session_id: str):
+def pause_conversion(session_id: str):
     """
     Pause an ongoing conversion process
     
     - session_id: UUID of the conversion session
     """
-    # Get current session status
-    status = get_session_status(session_id)
-    
-    # Check if process can be paused
-    if status["status"] != ConversionStatus.PROCESSING:
-        raise HTTPException(
-            status_code=HTTP_400_BAD_REQUEST,
-            detail=f"Cannot pause conversion in {status['status']} status"
-        )
-    
-    # Update session status
-    status["status"] = ConversionStatus.PAUSED
-    save_session_status(session_id, status)
+    status = transition_session(session_id, "pause")
     
     return {"session_id": session_id, "status": status["status"]}
 
 @router.post("/resume/{session_id}")
-async def resume_conversion(session_id: str, background_tasks: BackgroundTasks):
+def resume_conversion(session_id: str, background_tasks: BackgroundTasks):
     """
     Resume a paused conversion process
     
     - session_id: UUID of the conversion session
     """
-    # Get current session status
-    status = get_session_status(session_id)
-    
-    # Check if process can be resumed
-    if status["status"] != ConversionStatus.PAUSED:
-        raise HTTPException(
-            status_code=HTTP_400_BAD_REQUEST,
-            detail=f"Cannot resume conversion in {status['status']} status"
-        )
-    
-    # Update session status
-    status["status"] = ConversionStatus.PROCESSING
-    save_session_status(session_id, status)
+    status = transition_session(session_id, "resume")
     
     # Resume conversion in background
     from server.utils.converter import resume_conversion_task
@@ -202,26 +231,34 @@ async def resume_conversion(session_id: str, background_tasks: BackgroundTasks):
     return {"session_id": session_id, "status": status["status"]}
 
 @router.post("/cancel/{session_id}")
-async def cancel_conversion(session_id: str):
+def cancel_conversion(session_id: str):
     """
     Cancel a conversion process and reset progress
     
     - session_id: UUID of the conversion session
     """
-    # Get current session status
-    status = get_session_status(session_id)
-    
-    # Update session status
-    status["status"] = ConversionStatus.PENDING
-    status["progress"] = 0
-    status["current_page"] = 0
-    save_session_status(session_id, status)
+    output_paths = []
+    
+    def apply_cancel(status: dict) -> dict:
+        # Temporary output files are removed once the status is reset
+        if status.get("output_path"):
+            output_paths.append(status["output_path"])
+            status["output_path"] = None
+        
+        # Update session status
+        status["status"] = ConversionStatus.PENDING
+        status["progress"] = 0
+        status["current_page"] = 0
+        return status
+    
+    status = update_session_status(session_id, apply_cancel)
     
     # Remove any temporary output files
-    if status.get("output_path") and os.path.exists(status["output_path"]):
-        os.remove(status["output_path"])
-        status["output_path"] = None
-        save_session_status(session_id, status)
+    for output_path in output_paths:
+        try:
+            os.remove(output_path)
+        except FileNotFoundError:
+            pass
     
     return {"session_id": session_id, "status": status["status"]}
 
@@ -242,19 +279,24 @@ async def download_file(session_id: str):
             detail=f"Conversion is not completed (current status: {status['status']})"
         )
     
-    # Check if output file exists
-    if not status.get("output_path") or not os.path.exists(status["output_path"]):
+    # Check if output file exists - the stat result is handed to FileResponse
+    # so it doesn't stat the file again
+    if not status.get("output_path"):
+        raise HTTPException(status_code=404, detail="Output file not found")
+    try:
+        stat_result = os.stat(status["output_path"])
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Output file not found")
     
-    # Get original filename without extension
-    original_filename = os.path.splitext(status["filename"])[0]
-    
-    # Create response with the file
+    # Create response with the file, named after the original upload
+    # (sessions created before base_name was stored derive it here)
+    base_name = status.get("base_name") or os.path.splitext(status["filename"])[0]
     extension = status["output_format"]
-    filename = f"{original_filename}.{extension}"
+    filename = f"{base_name}.{extension}"
     
     return FileResponse(
         path=status["output_path"],
         filename=filename,
-        media_type="application/octet-stream"
+        media_type=MEDIA_TYPES.get(extension, "application/octet-stream"),
+        stat_result=stat_result
     ) 
\ No newline at end of file
@@ -1,31 +1,20 @@
-import os
-import json
 from fastapi import APIRouter, HTTPException
-from dotenv import load_dotenv
 from typing import Dict, Any, List
-
-# Load environment variables
-load_dotenv()
-
-# Constants from environment variables
-TEMP_FOLDER = os.getenv("TEMP_FOLDER", "server/temp_files")
+from server.utils import session_store
 
 # Create router
 router = APIRouter()
 
 # Helper function
-def get_session_file_path(session_id: str) -> str:
-    """Get the path to the session status file"""
-    return os.path.join(TEMP_FOLDER, f"{session_id}.json")
-
 def get_session_status(session_id: str) -> dict:
-    """Get session status from a JSON file"""
-    status_file = get_session_file_path(session_id)
-    if not os.path.exists(status_file):
+    """Get session status from the session store"""
+    # Reject malformed IDs before they are used in any lookup or file path
+    if not session_store.is_valid_session_id(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        return session_store.get(session_id)
+    except KeyError:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    with open(status_file, "r") as f:
-        return json.load(f)
 
 # Endpoints
 @router.get("/status/{session_id}")
@@ -73,20 +62,7 @@ async def list_sessions():
     List all active conversion sessions
     """
     try:
-        sessions = []
-        # List all .json files in the temp folder
-        if os.path.exists(TEMP_FOLDER):
-            for filename in os.listdir(TEMP_FOLDER):
-                if filename.endswith(".json"):
-                    session_id = os.path.splitext(filename)[0]
-                    try:
-                        status = get_session_status(session_id)
-                        sessions.append(status)
-                    except:
-                        # Skip invalid or corrupt status files
-                        continue
-        
-        return {"sessions": sessions}
+        return {"sessions": session_store.list_all()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing sessions: {str(e)}")
 
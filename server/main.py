@@ -1,43 +1,86 @@
-import os
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from anyio import to_thread
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, ORJSONResponse
+from starlette.status import HTTP_413_REQUEST_ENTITY_TOO_LARGE
 from pathlib import Path
-
-# Load environment variables from .env file
-load_dotenv()
+from server import config
 
 # Create necessary directories if they don't exist
-Path(os.getenv("UPLOAD_FOLDER", "uploads")).mkdir(exist_ok=True)
-Path(os.getenv("TEMP_FOLDER", "server/temp_files")).mkdir(exist_ok=True)
+Path(config.UPLOAD_FOLDER).mkdir(exist_ok=True)
+Path(config.TEMP_FOLDER).mkdir(exist_ok=True)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="PDF to Excel/CSV Converter API",
     description="API for converting PDF files to Excel or CSV format",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+)
+
+# Import routers
+# These will be created in separate files later
+from server.endpoints import conversion, status
+from server.utils import session_store
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject oversized uploads from their Content-Length header
+
+    Runs before the multipart body is parsed, so oversized requests are refused
+    without buffering any of the payload
+    """
+    def __init__(self, app, max_size: int):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/upload":
+            content_length = dict(scope["headers"]).get(b"content-length")
+            if content_length and content_length.isdigit() and int(content_length) > self.max_size:
+                response = JSONResponse(
+                    status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    content={"detail": f"File size exceeds maximum allowed ({config.MAX_UPLOAD_SIZE_MB:.1f}MB)"}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_size=config.MAX_UPLOAD_SIZE + conversion.UPLOAD_FORM_OVERHEAD,
 )
 
-# Configure CORS
-origins = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
-origins.append("http://localhost:8003")  # Add our API server to allowed origins
+# Configure CORS - added last so it is the outermost middleware, and
+# responses from the other middleware (e.g. 413) carry the CORS headers
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=origins,  # Use the origins from environment variables
+    allow_origins=config.CORS_ORIGINS,  # Use the origins from environment variables
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-# Import routers
-# These will be created in separate files later
-from server.endpoints import conversion, status
-
 # Register routers
 app.include_router(conversion.router, prefix="", tags=["Conversion"])
 app.include_router(status.router, prefix="", tags=["Status"])
 
+@app.on_event("startup")
+async def load_sessions():
+    """Hydrate the in-memory session store from the status checkpoints"""
+    session_store.load()
+
+@app.on_event("startup")
+async def configure_threadpool():
+    """Size the threadpool that runs sync endpoints and background conversions"""
+    to_thread.current_default_thread_limiter().total_tokens = config.THREADPOOL_WORKERS
+
+@app.on_event("shutdown")
+async def flush_sessions():
+    """Write any debounced session updates to their checkpoints"""
+    session_store.flush_all()
+
 @app.get("/")
 async def root():
     """Root endpoint to verify API is running"""
@@ -55,8 +98,12 @@ async def test():
     return {"message": "Test endpoint is working"}
 
 if __name__ == "__main__":
-    port = int(os.getenv("PORT", 8003))
-    host = os.getenv("HOST", "0.0.0.0")
-    debug = os.getenv("DEBUG", "False").lower() == "true"
-    
-    uvicorn.run("server.main:app", host=host, port=port, reload=debug) 
\ No newline at end of file
+    uvicorn.run(
+        "server.main:app",
+        host=config.HOST,
+        port=config.PORT,
+        reload=config.DEBUG,
+        workers=None if config.DEBUG else config.WORKERS,
+        loop="auto",  # uvloop when installed (it is not available on Windows)
+        http="httptools",
+    ) 
\ No newline at end of file
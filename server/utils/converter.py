@@ -1,39 +1,85 @@
 import os
-import time
-import json
 import pandas as pd
 import fitz  # PyMuPDF
-import tempfile
+import io
+import hashlib
+import shutil
+import threading
 from pathlib import Path
 from typing import List, Dict, Any, Tuple, Optional
-from dotenv import load_dotenv
 import logging
 import re
 import concurrent.futures
+import multiprocessing
 from PIL import Image
 import pytesseract
+try:
+    # Optional - runs Tesseract in-process instead of spawning a subprocess per image
+    import tesserocr
+except ImportError:
+    tesserocr = None
 from bidi.algorithm import get_display
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from functools import lru_cache
 import pdfplumber
 import arabic_reshaper
+from server.config import TEMP_FOLDER, TESSERACT_CMD, TESSERACT_LANGS, PDF_WORKERS, OCR_CONCURRENCY
+from server.utils import session_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Worker processes for page extraction. forkserver children are forked from a
+# clean, single-threaded server process that has this module preloaded, so they
+# start fast without inheriting the API server's threads; Windows only has spawn.
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _MP_CONTEXT = multiprocessing.get_context("forkserver")
+    _MP_CONTEXT.set_forkserver_preload([__name__])
+else:
+    _MP_CONTEXT = multiprocessing.get_context("spawn")
 
-# Constants from environment variables
-UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
-TEMP_FOLDER = os.getenv("TEMP_FOLDER", "server/temp_files")
-TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
-TESSERACT_LANGS = os.getenv("TESSERACT_LANGS", "eng+heb")
+# Per-thread tesserocr engines (see get_tess_api)
+_TESS_LOCAL = threading.local()
 
-# Configure tesseract
-if os.path.exists(TESSERACT_CMD):
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+# OCR text of recently seen images, keyed by a hash of the image bytes - logos,
+# headers and footers repeat on many pages of a report
+OCR_CACHE_SIZE = 512
+_OCR_CACHE: "OrderedDict[bytes, str]" = OrderedDict()
+_OCR_CACHE_LOCK = threading.Lock()
+
+# Newlines inside CSV cells are replaced with spaces
+CSV_NEWLINE_TRANSLATION = str.maketrans({'\n': ' ', '\r': ' '})
+
+# Pages with at least this many characters of embedded text are born-digital
+# and are not OCRed
+OCR_MIN_TEXT_CHARS = 50
+
+# Thread pool for OCRing the images of a page concurrently, created on first use
+_OCR_EXECUTOR = None
+_OCR_EXECUTOR_LOCK = threading.Lock()
+
+# Configure tesseract - resolve the binary once, whether TESSERACT_CMD is a
+# path or a bare command name looked up on PATH
+TESSERACT_BIN = shutil.which(TESSERACT_CMD)
+if TESSERACT_BIN:
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_BIN
+elif tesserocr is None:
+    logger.warning(f"Tesseract executable '{TESSERACT_CMD}' not found, OCR will not be available")
+
+# Precompiled regular expressions for the per-block / per-cell hot paths
+_HEBREW_RE = re.compile(r'[\u0590-\u05FF]')  # Hebrew Unicode range: 0x0590-0x05FF
+_WS_RE = re.compile(r'\s{3,}')
+_CELL_GAP_RE = re.compile(r'\s{2,}')
+_EXCEL_INVALID_RE = re.compile(r'[\[\]\\\/\*\?\:\']')
+
+# Below this length the numpy setup costs more than the regex scan it replaces
+RTL_SCAN_MIN_LENGTH = 32
+
+# Only strings up to this length (table cells, labels) are kept in the RTL
+# caches - whole pages of text would pin large strings in memory for good
+RTL_CACHE_MAX_LENGTH = 256
 
 # Status constants
 class ConversionStatus:
@@ -45,42 +91,75 @@ class ConversionStatus:
     ANALYSIS = "analysis"  # New state for PDF analysis
 
 # Helper functions
-def get_session_file_path(session_id: str) -> str:
-    """Get the path to the session status file"""
-    return os.path.join(TEMP_FOLDER, f"{session_id}.json")
-
 def save_session_status(session_id: str, status: dict) -> None:
-    """Save session status to a JSON file"""
-    with open(get_session_file_path(session_id), "w") as f:
-        json.dump(status, f)
+    """Save session status to the session store"""
+    session_store.set(session_id, status)
 
 def get_session_status(session_id: str) -> dict:
-    """Get session status from a JSON file"""
-    with open(get_session_file_path(session_id), "r") as f:
-        return json.load(f)
+    """Get session status from the session store"""
+    return session_store.get(session_id)
 
-def update_progress(session_id: str, current_page: int, total_pages: int) -> None:
-    """Update conversion progress"""
-    status = get_session_status(session_id)
-    
-    # Check if paused
-    if status["status"] == ConversionStatus.PAUSED:
-        return status
+def update_progress(session_id: str, current_page: int, total_pages: int) -> dict:
+    """
+    Update conversion progress and return the current session status
     
+    The status is read and written as one step, so a pause or cancel that
+    arrives meanwhile is never overwritten
+    """
     progress = int((current_page / total_pages) * 100) if total_pages > 0 else 0
     
-    status["progress"] = progress
-    status["current_page"] = current_page
-    status["total_pages"] = total_pages
+    def apply_progress(status: dict) -> Optional[dict]:
+        # Check if paused (or cancelled)
+        if status["status"] != ConversionStatus.PROCESSING:
+            return None
+        
+        # Nothing to save (e.g. a later page finished before the current one)
+        if (status.get("progress") == progress and status.get("current_page") == current_page
+                and status.get("total_pages") == total_pages):
+            return None
+        
+        status["progress"] = progress
+        status["current_page"] = current_page
+        status["total_pages"] = total_pages
+        return status
     
-    save_session_status(session_id, status)
-    return status
+    return session_store.update(session_id, apply_progress)
 
 def is_rtl_text(text: str) -> bool:
     """Check if text contains RTL characters (mainly Hebrew)"""
-    # Hebrew Unicode range: 0x0590-0x05FF
-    hebrew_pattern = re.compile(r'[\u0590-\u05FF]')
-    return bool(hebrew_pattern.search(text))
+    if len(text) > RTL_CACHE_MAX_LENGTH:
+        return _scan_rtl(text)
+    return _is_rtl_cached(text)
+
+@lru_cache(maxsize=16384)
+def _is_rtl_cached(text: str) -> bool:
+    """Cached RTL check for short strings - cell text repeats a lot"""
+    return _scan_rtl(text)
+
+def _scan_rtl(text: str) -> bool:
+    """Scan a string for Hebrew characters"""
+    if len(text) < RTL_SCAN_MIN_LENGTH:
+        return _HEBREW_RE.search(text) is not None
+    # Long strings: one vectorized range compare over the UTF-16 code units.
+    # Characters outside the BMP become surrogates, which are never in range.
+    units = np.frombuffer(text.encode('utf-16-le'), dtype=np.uint16)
+    return bool(((units >= 0x0590) & (units <= 0x05FF)).any())
+
+def rtl_mask(texts) -> np.ndarray:
+    """
+    Vectorized is_rtl_text over a sequence of strings
+    
+    All strings are scanned in one pass over their concatenated code points,
+    then the Hebrew characters are counted per string using the string offsets
+    """
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    codepoints = np.frombuffer(
+        "".join(texts).encode('utf-32-le', errors='surrogatepass'), dtype=np.uint32
+    )
+    hebrew = (codepoints >= 0x0590) & (codepoints <= 0x05FF)
+    hebrew_before = np.concatenate(([0], np.cumsum(hebrew)))
+    ends = np.cumsum(lengths)
+    return hebrew_before[ends] > hebrew_before[ends - lengths]
 
 def fix_rtl_text(text: str) -> str:
     """
@@ -91,7 +170,17 @@ def fix_rtl_text(text: str) -> str:
     """
     if not text or not is_rtl_text(text):
         return text
-    
+    if len(text) > RTL_CACHE_MAX_LENGTH:
+        return _reshape_rtl(text)
+    return _fix_rtl_cached(text)
+
+@lru_cache(maxsize=8192)
+def _fix_rtl_cached(text: str) -> str:
+    """Reshape and reorder RTL text - pure, so repeated headers and labels hit the cache"""
+    return _reshape_rtl(text)
+
+def _reshape_rtl(text: str) -> str:
+    """Reshape and reorder RTL text"""
     try:
         # Reshape Arabic and Hebrew text (handles connecting characters properly)
         reshaped_text = arabic_reshaper.reshape(text)
@@ -102,6 +191,11 @@ def fix_rtl_text(text: str) -> str:
         logger.error(f"Error fixing RTL text: {str(e)}")
         return text
 
+@lru_cache(maxsize=8192)
+def reorder_rtl_cell(text: str) -> str:
+    """Apply the bidi algorithm to a table cell - cached, as cell labels repeat"""
+    return get_display(text)
+
 def preprocess_text(text: str) -> str:
     """Preprocess extracted text"""
     # Handle RTL text using the improved method
@@ -109,7 +203,7 @@ def preprocess_text(text: str) -> str:
         text = fix_rtl_text(text)
     
     # Remove excessive whitespace while preserving some structure
-    text = re.sub(r'\s{3,}', '  ', text).strip()
+    text = _WS_RE.sub('  ', text).strip()
     
     return text
 
@@ -125,161 +219,225 @@ def is_number(text: str) -> bool:
     except ValueError:
         return False
 
-def extract_text_from_page(page) -> str:
-    """Extract text from a PyMuPDF page"""
-    return page.get_text()
+def numeric_cells(column: pd.Series) -> pd.Series:
+    """
+    Vectorized is_number: mask of the cells of a string column that represent numbers
+    
+    pd.to_numeric accepts a subset of what float() does, so the cells it
+    rejects that may still be numbers - those containing a digit, "nan" or
+    "inf", e.g. '1_000', '١٢٣' or '1e400' - are checked with is_number
+    """
+    cleaned = column.str.replace(',', '', regex=False).str.replace(' ', '', regex=False)
+    numeric = pd.to_numeric(cleaned, errors='coerce').notna().to_numpy()
+    recheck = ~numeric & cleaned.str.contains(r'\d|nan|inf', case=False, na=False).to_numpy(dtype=bool)
+    if recheck.any():
+        numeric[recheck] = [is_number(text) for text in cleaned.to_numpy()[recheck]]
+    return pd.Series(numeric, index=column.index)
+
+def extract_text_from_page(page, textpage=None) -> str:
+    """Extract text from a PyMuPDF page, reusing an already parsed TextPage if given"""
+    return page.get_text(textpage=textpage)
+
+def get_tess_api():
+    """
+    Get this thread's persistent tesserocr engine, creating it on first use
+    
+    Initializing Tesseract loads the language data, so the engine is kept for
+    the lifetime of the worker instead of being created per image. Engines are
+    not thread-safe, hence one per thread.
+    """
+    api = getattr(_TESS_LOCAL, "api", None)
+    if api is None:
+        api = tesserocr.PyTessBaseAPI(lang=TESSERACT_LANGS, psm=tesserocr.PSM.AUTO)
+        _TESS_LOCAL.api = api
+    return api
 
 def extract_text_from_image(image_bytes) -> str:
     """Extract text from an image using OCR"""
     try:
-        # Convert bytes to PIL Image
-        image = Image.open(tempfile.NamedTemporaryFile(suffix='.png', delete=False))
-        image.save(image.filename)
-        
-        # Use Tesseract OCR to extract text
-        text = pytesseract.image_to_string(image, lang=TESSERACT_LANGS)
+        # Decode the image straight from memory - no temporary file
+        image = Image.open(io.BytesIO(image_bytes))
+        image.load()
         
-        # Clean up
-        os.unlink(image.filename)
+        if tesserocr is not None:
+            # In-process OCR with the persistent engine
+            api = get_tess_api()
+            api.SetImage(image)
+            return api.GetUTF8Text()
         
-        return text
+        # Use Tesseract OCR to extract text
+        return pytesseract.image_to_string(image, lang=TESSERACT_LANGS)
     except Exception as e:
         logger.error(f"OCR error: {str(e)}")
         return ""
 
-def analyze_text_layout(page) -> List[Dict]:
+def extract_text_from_image_cached(image_bytes) -> str:
+    """Extract text from an image using OCR, reusing the result for repeated images"""
+    key = hashlib.blake2b(image_bytes, digest_size=16).digest()
+    with _OCR_CACHE_LOCK:
+        text = _OCR_CACHE.get(key)
+        if text is not None:
+            _OCR_CACHE.move_to_end(key)
+            return text
+    
+    text = extract_text_from_image(image_bytes)
+    
+    with _OCR_CACHE_LOCK:
+        _OCR_CACHE[key] = text
+        if len(_OCR_CACHE) > OCR_CACHE_SIZE:
+            _OCR_CACHE.popitem(last=False)
+    return text
+
+def get_ocr_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Get this process's OCR thread pool, creating it on first use"""
+    global _OCR_EXECUTOR
+    with _OCR_EXECUTOR_LOCK:
+        if _OCR_EXECUTOR is None:
+            _OCR_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+                max_workers=OCR_CONCURRENCY, thread_name_prefix="ocr"
+            )
+        return _OCR_EXECUTOR
+
+def extract_text_from_images(images: List[bytes]) -> List[str]:
+    """
+    Extract text from several images using OCR
+    
+    Tesseract releases the GIL (tesserocr) or runs as a subprocess
+    (pytesseract), so the images are recognized concurrently in threads.
+    Texts are returned in the order of the images.
+    """
+    if len(images) <= 1 or OCR_CONCURRENCY <= 1:
+        return [extract_text_from_image_cached(image_bytes) for image_bytes in images]
+    return list(get_ocr_executor().map(extract_text_from_image_cached, images))
+
+def analyze_text_layout(page, textpage=None) -> Tuple[List[str], np.ndarray]:
     """
     Enhanced analysis of the text layout on a page using PyMuPDF's text extraction
     
-    Returns a list of blocks with their positions and text
+    Returns the text of every line block and an (N, 4) array of their
+    x0, y0, x1, y1 bounding boxes, in matching order
     """
     # Extract text blocks with their positions
-    blocks = page.get_text("dict")["blocks"]
-    text_blocks = []
+    blocks = page.get_text("dict", textpage=textpage)["blocks"]
+    texts = []
+    bboxes = []
     
     for block in blocks:
         if block.get("type") == 0:  # Type 0 is text
             for line in block.get("lines", []):
-                line_text = ""
-                line_bbox = line.get("bbox", [0, 0, 0, 0])
-                
-                for span in line.get("spans", []):
-                    line_text += span.get("text", "")
+                line_text = "".join(span.get("text", "") for span in line.get("spans", []))
                 
                 if line_text.strip():
                     # Store the original text without RTL handling at this stage
-                    text_blocks.append({
-                        "text": line_text.strip(),
-                        "bbox": line_bbox,
-                        "x0": line_bbox[0],
-                        "y0": line_bbox[1],
-                        "x1": line_bbox[2],
-                        "y1": line_bbox[3]
-                    })
+                    texts.append(line_text.strip())
+                    bboxes.append(line.get("bbox", (0, 0, 0, 0)))
+    
+    bboxes = np.array(bboxes, dtype=np.float64).reshape(-1, 4)
     
     # Sort blocks by y-coordinate (top to bottom)
-    text_blocks.sort(key=lambda b: b["y0"])
+    order = np.argsort(bboxes[:, 1], kind="stable")
     
-    return text_blocks
+    return [texts[i] for i in order], bboxes[order]
 
-def identify_columns(text_blocks: List[Dict]) -> List[float]:
+def identify_columns(bboxes: np.ndarray) -> List[float]:
     """
     Identify column positions based on the alignment of text blocks
     
     Returns a list of x-coordinates that likely represent column boundaries
     """
-    # Collect all starting x-coordinates
-    x_positions = [block["x0"] for block in text_blocks]
+    if not len(bboxes):
+        return []
+
+    # Collect all starting x-coordinates, sorted
+    x_positions = np.sort(bboxes[:, 0])
     
-    # Group similar x-positions (allowing for small differences)
-    x_clusters = []
+    # Group similar x-positions (allowing for small differences).
+    # A gap larger than the tolerance always starts a new cluster, and a run
+    # spanning no more than the tolerance is always a single cluster
     tolerance = 10  # Increased tolerance for RTL text alignment variations
-    
-    for pos in sorted(x_positions):
-        # Check if this position belongs to an existing cluster
-        found_cluster = False
-        for i, cluster in enumerate(x_clusters):
-            if abs(cluster["center"] - pos) <= tolerance:
-                cluster["positions"].append(pos)
-                # Update center as average
-                cluster["center"] = sum(cluster["positions"]) / len(cluster["positions"])
-                found_cluster = True
-                break
-        
-        # If not found, create a new cluster
-        if not found_cluster:
-            x_clusters.append({"center": pos, "positions": [pos]})
+    breaks = np.flatnonzero(np.diff(x_positions) > tolerance) + 1
+    centers = []
+    counts = []
+    for run in np.split(x_positions, breaks):
+        if run[-1] - run[0] <= tolerance:
+            centers.append(run.mean())
+            counts.append(run.size)
+            continue
+        # Wide run - cluster around running averages, one position at a time
+        clusters = []
+        for pos in run.tolist():
+            for cluster in clusters:
+                if abs(cluster[0] / cluster[1] - pos) <= tolerance:
+                    cluster[0] += pos
+                    cluster[1] += 1
+                    break
+            else:
+                clusters.append([pos, 1])
+        centers.extend(total / count for total, count in clusters)
+        counts.extend(count for _, count in clusters)
+    centers = np.array(centers)
+    counts = np.array(counts)
     
     # Filter clusters with enough occurrences to be considered columns
-    min_occurrences = max(2, len(text_blocks) // 10)  # At least 2 occurrences or 10% of blocks
-    column_positions = [cluster["center"] for cluster in x_clusters 
-                       if len(cluster["positions"]) >= min_occurrences]
-    
-    return sorted(column_positions)
+    min_occurrences = max(2, len(bboxes) // 10)  # At least 2 occurrences or 10% of blocks
+    return np.sort(centers[counts >= min_occurrences]).tolist()
 
-def group_blocks_into_rows(text_blocks: List[Dict]) -> List[List[Dict]]:
+def group_blocks_into_rows(bboxes: np.ndarray) -> List[np.ndarray]:
     """
     Group text blocks into rows based on their vertical positions
     
-    Returns a list of rows, where each row is a list of text blocks
+    Returns a list of rows, where each row is an array of block indices
     """
-    rows = []
-    current_row = []
+    if not len(bboxes):
+        return []
     
     # Sort blocks by y-coordinate
-    sorted_blocks = sorted(text_blocks, key=lambda b: b["y0"])
+    order = np.argsort(bboxes[:, 1], kind="stable")
     
-    if not sorted_blocks:
-        return rows
-    
-    # Start with the first block
-    current_row = [sorted_blocks[0]]
-    current_y = sorted_blocks[0]["y1"]
-    
-    # Group blocks with similar y-coordinates
-    for block in sorted_blocks[1:]:
+    # Find where rows break. The running bottom resets at every new row, so
+    # this stays a scalar loop, but over plain floats rather than block dicts
+    breaks = []
+    y0 = bboxes[order, 1].tolist()
+    y1 = bboxes[order, 3].tolist()
+    current_y = y1[0]
+    for i in range(1, len(y0)):
         # If the block is near the current row, add it
-        if abs(block["y0"] - current_y) < 10:  # Increased tolerance for row detection
-            current_row.append(block)
+        if abs(y0[i] - current_y) < 10:  # Increased tolerance for row detection
             # Update current_y to the maximum bottom coordinate
-            current_y = max(current_y, block["y1"])
+            current_y = max(current_y, y1[i])
         else:
-            # Sort blocks in row by x-coordinate
-            current_row.sort(key=lambda b: b["x0"])
-            rows.append(current_row)
-            current_row = [block]
-            current_y = block["y1"]
-    
-    # Add the last row
-    if current_row:
-        current_row.sort(key=lambda b: b["x0"])
-        rows.append(current_row)
-    
-    return rows
+            breaks.append(i)
+            current_y = y1[i]
+    
+    # Sort blocks in row by x-coordinate
+    return [row[np.argsort(bboxes[row, 0], kind="stable")]
+            for row in np.split(order, breaks)]
 
-def assign_blocks_to_columns(rows: List[List[Dict]], column_positions: List[float]) -> List[List[List[Dict]]]:
+def assign_blocks_to_columns(rows: List[np.ndarray], column_positions: List[float],
+                             bboxes: np.ndarray) -> List[List[List[int]]]:
     """
     Assign text blocks to their respective columns
     
     Returns a list of rows, where each row is a list of columns, 
-    and each column contains blocks belonging to that column
+    and each column contains the indices of the blocks belonging to that column
     """
-    structured_rows = []
+    if not rows:
+        return []
     
-    for row in rows:
-        # Initialize empty columns (add one extra for the rightmost column)
-        columns = [[] for _ in range(len(column_positions) + 1)]
-        
-        for block in row:
-            # Find which column this block belongs to
-            col_index = 0
-            for i, col_pos in enumerate(column_positions):
-                if block["x0"] >= col_pos - 10:  # Increased tolerance
-                    col_index = i
-            
-            columns[col_index].append(block)
-        
-        structured_rows.append(columns)
+    # Left edges of the (sorted) columns, with the increased tolerance applied
+    column_starts = np.asarray(column_positions, dtype=np.float64) - 10
+    
+    # Bin the blocks of all rows in one pass - each block belongs to the
+    # last column starting at or before it
+    block_indices = np.concatenate(rows)
+    row_indices = np.repeat(np.arange(len(rows)), [len(row) for row in rows])
+    col_indices = np.maximum(np.digitize(bboxes[block_indices, 0], column_starts) - 1, 0)
+    
+    # Initialize empty columns (add one extra for the rightmost column)
+    structured_rows = [[[] for _ in range(len(column_positions) + 1)] for _ in rows]
+    for row_index, col_index, block_idx in zip(row_indices.tolist(), col_indices.tolist(),
+                                               block_indices.tolist()):
+        structured_rows[row_index][col_index].append(block_idx)
     
     return structured_rows
 
@@ -338,7 +496,7 @@ def detect_tables_in_text(text: str) -> List[Dict[str, Any]]:
                 cells = [cell.strip() for cell in line.split(delimiter)]
             else:
                 # Split by whitespace (keeping consecutive whitespace as a single delimiter)
-                cells = re.split(r'\s{2,}', line)
+                cells = _CELL_GAP_RE.split(line)
             
             # Remove empty cells
             cells = [cell for cell in cells if cell]
@@ -363,7 +521,7 @@ def detect_tables_in_text(text: str) -> List[Dict[str, Any]]:
     
     return structured_tables
 
-def extract_structured_table(page) -> Optional[List[List[str]]]:
+def extract_structured_table(page, textpage=None) -> Optional[List[List[str]]]:
     """
     Extract a structured table from a PDF page using layout analysis
     
@@ -371,19 +529,19 @@ def extract_structured_table(page) -> Optional[List[List[str]]]:
     """
     try:
         # Get text blocks with their positions
-        text_blocks = analyze_text_layout(page)
+        texts, bboxes = analyze_text_layout(page, textpage)
         
-        if not text_blocks:
+        if not texts:
             return None
         
         # Identify column positions
-        column_positions = identify_columns(text_blocks)
+        column_positions = identify_columns(bboxes)
         
         # Group blocks into rows
-        rows = group_blocks_into_rows(text_blocks)
+        rows = group_blocks_into_rows(bboxes)
         
         # Assign blocks to columns
-        structured_rows = assign_blocks_to_columns(rows, column_positions)
+        structured_rows = assign_blocks_to_columns(rows, column_positions, bboxes)
         
         # Convert to text rows
         table_rows = []
@@ -392,10 +550,11 @@ def extract_structured_table(page) -> Optional[List[List[str]]]:
             for column in row:
                 if column:
                     # Combine all blocks in this column
-                    combined_text = " ".join(block["text"] for block in column)
-                    # Handle RTL at the cell level
+                    combined_text = " ".join(texts[i] for i in column)
+                    # Handle RTL at the cell level. Each cell is its own
+                    # bidi paragraph, so cells can't be batched into one call
                     if is_rtl_text(combined_text):
-                        combined_text = get_display(combined_text)
+                        combined_text = reorder_rtl_cell(combined_text)
                     text_row.append(combined_text)
                 else:
                     text_row.append("")
@@ -447,27 +606,23 @@ def normalize_table_data(tables: List[Dict[str, Any]]) -> pd.DataFrame:
             logger.warning("Table with only one column detected in text-based extraction")
             return pd.DataFrame()
         
-        # Ensure all rows have same number of columns
-        padded_rows = []
-        for i, row in enumerate(rows):
-            # Skip header row if it's identified as a header
-            if i == 0 and is_header:
-                continue
-                
-            if len(row) < max_cols:
-                padded_rows.append(row + [''] * (max_cols - len(row)))
-            else:
-                padded_rows.append(row[:max_cols])  # Trim if too long
+        # Skip header row if it's identified as a header
+        data_rows = rows[1:] if is_header else rows
+        
+        # Ensure all rows have same number of columns - short rows are
+        # padded with empty cells and long rows trimmed
+        cells = np.full((len(data_rows), max_cols), '', dtype=object)
+        for i, row in enumerate(data_rows):
+            row = row[:max_cols]
+            cells[i, :len(row)] = row
         
         # Make sure all cells are properly converted to strings
-        clean_rows = []
-        for row in padded_rows:
-            clean_row = [str(cell) if cell is not None else '' for cell in row]
-            clean_rows.append(clean_row)
+        cells[np.equal(cells, None)] = ''
+        cells = np.frompyfunc(str, 1, 1)(cells)
         
         try:
             # Create DataFrame
-            df = pd.DataFrame(clean_rows)
+            df = pd.DataFrame(cells)
             
             # Set column headers if we have a header row
             if is_header:
@@ -489,12 +644,11 @@ def normalize_table_data(tables: List[Dict[str, Any]]) -> pd.DataFrame:
     for col in df.columns:
         try:
             # Check if at least 50% of non-empty values in column look like numbers
-            non_empty = df[col][df[col].astype(str).str.strip() != '']
-            if len(non_empty) > 0:
-                num_count = sum(is_number(str(x)) for x in non_empty)
-                if num_count / len(non_empty) >= 0.5:
-                    # Convert to numeric, coerce errors to NaN
-                    df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', ''), errors='coerce')
+            as_str = df[col].astype(str)
+            non_empty = as_str.str.strip() != ''
+            if non_empty.any() and numeric_cells(as_str)[non_empty].mean() >= 0.5:
+                # Convert to numeric, coerce errors to NaN
+                df[col] = pd.to_numeric(as_str.str.replace(',', ''), errors='coerce')
         except Exception as e:
             logger.warning(f"Error converting column {col} to numeric: {str(e)}")
     
@@ -544,120 +698,113 @@ def merge_multiline_entries(rows):
     
     return merged_rows
 
-def extract_tables_with_pdfplumber(pdf_path: str, page_num: int) -> List[pd.DataFrame]:
+def extract_tables_with_pdfplumber(page) -> List[pd.DataFrame]:
     """
     Extract tables from a PDF page using pdfplumber with enhanced table detection
     and data type preservation, especially for numerical values.
     
     Args:
-        pdf_path: Path to the PDF file
-        page_num: Page number to extract tables from (0-based)
+        page: pdfplumber page to extract tables from
     
     Returns:
         List of pandas DataFrames, each representing a table
     """
     try:
         tables = []
-        with pdfplumber.open(pdf_path) as pdf:
-            if page_num < len(pdf.pages):
-                page = pdf.pages[page_num]
+        # Try different table extraction strategies
+        # 1. First try with default settings
+        extracted_tables = page.extract_tables()
+        
+        # 2. Try with text-based strategy if no tables found
+        if not extracted_tables:
+            extracted_tables = page.extract_tables(
+                table_settings={
+                    "vertical_strategy": "text", 
+                    "horizontal_strategy": "text",
+                    "intersection_tolerance": 5,
+                    "join_tolerance": 15,
+                    "edge_min_length": 3,
+                    "min_words_vertical": 1,
+                    "min_words_horizontal": 1
+                }
+            )
+        
+        # 3. Try with line-based strategy if still no tables
+        if not extracted_tables:
+            extracted_tables = page.extract_tables(
+                table_settings={
+                    "vertical_strategy": "lines", 
+                    "horizontal_strategy": "lines",
+                    "intersection_tolerance": 10,
+                    "join_tolerance": 20,
+                    "edge_min_length": 5
+                }
+            )
+        
+        # Convert each table to DataFrame
+        for table in extracted_tables:
+            if table and len(table) > 0:
+                # Get header (first row)
+                header = table[0]
+                data = table[1:] if len(table) > 1 else []
                 
-                # Try different table extraction strategies
-                # 1. First try with default settings
-                extracted_tables = page.extract_tables()
+                # Skip tables with only one column
+                if len(header) <= 1:
+                    continue
                 
-                # 2. Try with text-based strategy if no tables found
-                if not extracted_tables:
-                    extracted_tables = page.extract_tables(
-                        table_settings={
-                            "vertical_strategy": "text", 
-                            "horizontal_strategy": "text",
-                            "intersection_tolerance": 5,
-                            "join_tolerance": 15,
-                            "edge_min_length": 3,
-                            "min_words_vertical": 1,
-                            "min_words_horizontal": 1
-                        }
-                    )
+                # Clean data and header - properly handle RTL text
+                clean_header = []
+                for i, cell in enumerate(header):
+                    if cell is None:
+                        clean_header.append(f"Column {i+1}")
+                    else:
+                        cell_text = str(cell).strip()
+                        if is_rtl_text(cell_text):
+                            clean_header.append(fix_rtl_text(cell_text))
+                        else:
+                            clean_header.append(cell_text)
                 
-                # 3. Try with line-based strategy if still no tables
-                if not extracted_tables:
-                    extracted_tables = page.extract_tables(
-                        table_settings={
-                            "vertical_strategy": "lines", 
-                            "horizontal_strategy": "lines",
-                            "intersection_tolerance": 10,
-                            "join_tolerance": 20,
-                            "edge_min_length": 5
-                        }
-                    )
+                # Clean column names to be valid for Excel
+                clean_header = [sanitize_column_name(col) for col in clean_header]
                 
-                # Convert each table to DataFrame
-                for table in extracted_tables:
-                    if table and len(table) > 0:
-                        # Get header (first row)
-                        header = table[0]
-                        data = table[1:] if len(table) > 1 else []
-                        
-                        # Skip tables with only one column
-                        if len(header) <= 1:
+                # Cells stay strings here; numbers are converted per column below
+                clean_data = [
+                    ["" if cell is None else fix_rtl_text(str(cell).strip()) for cell in row]
+                    for row in data
+                ]
+                
+                # Create DataFrame
+                if clean_data:
+                    df = pd.DataFrame(clean_data, columns=clean_header)
+                    
+                    # Convert numeric columns to appropriate types
+                    for col in df.columns:
+                        column = df[col]
+                        if column.dtype != 'object':  # Only process string columns
+                            continue
+                        non_empty = column != ''
+                        if not non_empty.any():
                             continue
                         
-                        # Clean data and header - properly handle RTL text
-                        clean_header = []
-                        for i, cell in enumerate(header):
-                            if cell is None:
-                                clean_header.append(f"Column {i+1}")
-                            else:
-                                cell_text = str(cell).strip()
-                                if is_rtl_text(cell_text):
-                                    clean_header.append(fix_rtl_text(cell_text))
-                                else:
-                                    clean_header.append(cell_text)
-                        
-                        # Clean column names to be valid for Excel
-                        clean_header = [sanitize_column_name(col) for col in clean_header]
+                        numeric = non_empty & numeric_cells(column)
+                        if not numeric.any():
+                            continue
                         
-                        clean_data = []
-                        for row in data:
-                            clean_row = []
-                            for cell in row:
-                                if cell is None:
-                                    clean_row.append("")
-                                else:
-                                    cell_text = str(cell).strip()
-                                    # Preserve numeric values as numbers
-                                    if is_numeric(cell_text):
-                                        try:
-                                            # Try to convert to float or int
-                                            if '.' in cell_text:
-                                                clean_row.append(float(cell_text.replace(',', '')))
-                                            else:
-                                                clean_row.append(int(cell_text.replace(',', '')))
-                                        except ValueError:
-                                            # If conversion fails, keep as string
-                                            clean_row.append(cell_text)
-                                    elif is_rtl_text(cell_text):
-                                        clean_row.append(fix_rtl_text(cell_text))
-                                    else:
-                                        clean_row.append(cell_text)
-                            clean_data.append(clean_row)
+                        # Convert the numeric cells to ints or floats with parse_number,
+                        # which accepts more than pd.to_numeric does
+                        values = column.to_numpy(dtype=object, copy=True)
+                        is_num = numeric.to_numpy()
+                        values[is_num] = [parse_number(text) for text in values[is_num]]
                         
-                        # Create DataFrame
-                        if clean_data:
-                            df = pd.DataFrame(clean_data, columns=clean_header)
-                            
-                            # Convert numeric columns to appropriate types
-                            for col in df.columns:
-                                if df[col].dtype == 'object':  # Only process string columns
-                                    # Check if at least 70% of non-empty values are numeric
-                                    non_empty = df[col].astype(str).str.strip() != ''
-                                    if non_empty.sum() > 0:
-                                        numeric_values = df[col][non_empty].apply(lambda x: is_numeric(str(x)))
-                                        if numeric_values.sum() / len(numeric_values) >= 0.7:
-                                            df[col] = pd.to_numeric(df[col], errors='coerce')
-                            
-                            tables.append(df)
+                        # Check if at least 70% of non-empty values are numeric
+                        if numeric.sum() / non_empty.sum() >= 0.7:
+                            # Built from a list, so that ints mixed with floats become float64
+                            df[col] = pd.to_numeric(pd.Series(values.tolist(), index=column.index), errors='coerce')
+                        else:
+                            # Mostly text - preserve the numeric cells as numbers
+                            df[col] = values
+                    
+                    tables.append(df)
         
         return tables
     except Exception as e:
@@ -679,7 +826,7 @@ def sanitize_column_name(name: str) -> str:
         return "Column"
         
     # Remove or replace problematic characters
-    sanitized = re.sub(r'[\[\]\\\/\*\?\:\']', '', name)
+    sanitized = _EXCEL_INVALID_RE.sub('', name)
     sanitized = sanitized.strip()
     
     # Ensure column name isn't empty after sanitization
@@ -708,16 +855,49 @@ def is_numeric(text: str) -> bool:
     except ValueError:
         return False
 
+def parse_number(text: str):
+    """Convert a numeric string to an int or float, or return it unchanged"""
+    if is_numeric(text):
+        try:
+            # Try to convert to float or int
+            if '.' in text:
+                return float(text.replace(',', ''))
+            return int(text.replace(',', ''))
+        except ValueError:
+            # If conversion fails, keep as string
+            pass
+    return text
+
+def preview_value(value):
+    """Make a cell value JSON-safe - orjson rejects integers that don't fit in 64 bits"""
+    if isinstance(value, int) and not -2**63 <= value < 2**63:
+        return str(value)
+    return value
+
 def analyze_pdf_structure(pdf_path: str) -> Dict[str, Any]:
     """
     Analyze the structure of a PDF to determine the best extraction strategy
     
+    Results are cached by file modification time and size, so resuming a
+    conversion doesn't analyze the same file again
+    
     Args:
         pdf_path: Path to the PDF file
     
     Returns:
         Dictionary containing analysis results
     """
+    try:
+        st = os.stat(pdf_path)
+        signature = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        # Missing file - the analysis below logs the error
+        signature = None
+    return dict(_analyze_pdf_structure(pdf_path, signature))
+
+@lru_cache(maxsize=64)
+def _analyze_pdf_structure(pdf_path: str, signature: Optional[tuple]) -> Dict[str, Any]:
+    """Analyze a PDF - the signature argument only keys the cache"""
     results = {
         "page_count": 0,
         "has_tables": False,
@@ -736,9 +916,9 @@ def analyze_pdf_structure(pdf_path: str) -> Dict[str, Any]:
             for i in range(pages_to_check):
                 page = pdf.pages[i]
                 
-                # Check for tables
-                tables = page.extract_tables()
-                if tables:
+                # Check for tables - finding them from the page edges is enough,
+                # without extracting the text of every cell
+                if page.find_tables():
                     results["has_tables"] = True
                 
                 # Check for images
@@ -765,6 +945,162 @@ def analyze_pdf_structure(pdf_path: str) -> Dict[str, Any]:
     
     return results
 
+def open_plumber_pdf(pdf_path: str):
+    """Open a PDF with pdfplumber, or return None if it cannot be parsed"""
+    try:
+        return pdfplumber.open(pdf_path)
+    except Exception as e:
+        logger.error(f"Error opening PDF with pdfplumber: {str(e)}")
+        return None
+
+def extract_page(doc, plumber_pdf, page_num: int, extraction_strategy: str) -> Tuple[int, Dict[str, list]]:
+    """
+    Extract the table data from a single page of an open PDF
+    
+    Args:
+        doc: PyMuPDF document
+        plumber_pdf: pdfplumber document, or None to skip pdfplumber extraction
+        page_num: Page number to process (0-based)
+        extraction_strategy: Strategy suggested by analyze_pdf_structure
+    
+    Returns:
+        Tuple of the page number and a dictionary with the pdfplumber
+        DataFrames, structured table rows and text-detected tables of the page
+    """
+    result = {"dataframes": [], "structured_rows": [], "text_tables": []}
+    
+    # Use the best strategy based on analysis
+    if plumber_pdf is not None and page_num < len(plumber_pdf.pages):
+        # PDFPlumber is best for tables and RTL content
+        plumber_page = plumber_pdf.pages[page_num]
+        plumber_tables = extract_tables_with_pdfplumber(plumber_page)
+        # Drop the page's cached objects - each page is only read once
+        plumber_page.close()
+        if plumber_tables:
+            logger.info(f"Found {len(plumber_tables)} tables using pdfplumber on page {page_num+1}")
+            # Skip other extraction methods if pdfplumber found tables
+            result["dataframes"] = plumber_tables
+            return page_num, result
+    
+    page = doc[page_num]
+    
+    # Parse the page's text once for both the layout analysis and the plain
+    # text fallback. The dict flags give the same plain text as get_text()
+    textpage = page.get_textpage(flags=fitz.TEXTFLAGS_DICT)
+    
+    # If PDFPlumber didn't find tables or wasn't the chosen strategy, try structured table extraction
+    structured_table = extract_structured_table(page, textpage)
+    
+    if structured_table and len(structured_table) > 1:
+        # We found a structured table using layout analysis
+        logger.info(f"Found structured table on page {page_num+1} with {len(structured_table)} rows")
+        
+        # Merge multiline entries if needed
+        result["structured_rows"] = merge_multiline_entries(structured_table)
+    else:
+        # Fall back to text-based extraction
+        # Extract text from page
+        text = extract_text_from_page(page, textpage)
+        
+        # Only pages without enough embedded text (scans) are OCRed -
+        # born-digital pages never need Tesseract, whatever the strategy
+        if len(text.strip()) < OCR_MIN_TEXT_CHARS:
+            # Check if page has images
+            image_list = page.get_images(full=True)
+            
+            if image_list:
+                images = [doc.extract_image(img_info[0])["image"] for img_info in image_list]
+                
+                # Extract text from the images using OCR
+                for ocr_text in extract_text_from_images(images):
+                    text += "\n" + ocr_text
+        
+        # Preprocess text with proper RTL handling
+        text = preprocess_text(text)
+        
+        # Detect tables
+        result["text_tables"] = detect_tables_in_text(text)
+    
+    return page_num, result
+
+def extract_pages(pdf_path: str, page_nums, extraction_strategy: str):
+    """
+    Extract the table data from a run of PDF pages, parsing the PDF only once
+    
+    Yields (page_num, result) tuples in page order
+    """
+    # pdfplumber is only needed by the table- and RTL-oriented strategies
+    use_plumber = extraction_strategy in ("plumber", "rtl_optimized")
+    plumber_pdf = open_plumber_pdf(pdf_path) if use_plumber else None
+    try:
+        with fitz.open(pdf_path) as doc:
+            for page_num in page_nums:
+                yield extract_page(doc, plumber_pdf, page_num, extraction_strategy)
+    finally:
+        if plumber_pdf is not None:
+            plumber_pdf.close()
+
+def process_pages(pdf_path: str, start: int, end: int, extraction_strategy: str) -> List[Tuple[int, Dict[str, list]]]:
+    """
+    Extract the table data from a chunk of consecutive PDF pages
+    
+    Runs in a worker process, so it opens the PDF itself (PyMuPDF and
+    pdfplumber documents cannot be pickled) - once per chunk rather than
+    once per page
+    """
+    return list(extract_pages(pdf_path, range(start, end), extraction_strategy))
+
+# Page chunks per worker process that the document is split into - enough
+# for an even load across the workers, while each chunk parses the PDF once
+CHUNKS_PER_WORKER = 4
+
+# Chunks queued per worker process - enough to keep every worker busy while
+# results are collected, without buffering the whole document
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+def iter_page_results(pdf_path: str, page_nums: range, extraction_strategy: str):
+    """
+    Process pages in a pool of worker processes
+    
+    The pages are split into chunks of consecutive pages, and each worker
+    opens the PDF once per chunk. Yields (page_num, result) tuples as chunks
+    complete, which is not necessarily in page order. At most
+    CHUNKS_IN_FLIGHT_PER_WORKER chunks per worker are queued at once, so
+    results don't pile up faster than the caller consumes them. When the
+    caller stops iterating early (e.g. on pause), chunks that have not
+    started yet are cancelled.
+    """
+    max_workers = min(PDF_WORKERS, len(page_nums))
+    
+    # A single page (or worker) isn't worth the cost of starting a pool
+    if max_workers <= 1:
+        yield from extract_pages(pdf_path, page_nums, extraction_strategy)
+        return
+    
+    chunk_size = -(-len(page_nums) // (max_workers * CHUNKS_PER_WORKER))
+    
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=_MP_CONTEXT)
+    try:
+        pending_chunks = iter(range(page_nums.start, page_nums.stop, chunk_size))
+        in_flight = set()
+        while True:
+            # Top up the queue of submitted chunks
+            for start in pending_chunks:
+                end = min(start + chunk_size, page_nums.stop)
+                in_flight.add(executor.submit(process_pages, pdf_path, start, end, extraction_strategy))
+                if len(in_flight) >= max_workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                    break
+            if not in_flight:
+                break
+            
+            done, in_flight = concurrent.futures.wait(
+                in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                yield from future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
 def process_pdf(session_id: str, output_format: str, start_page: int = 0) -> None:
     """
     Process a PDF file and extract tables
@@ -779,11 +1115,11 @@ def process_pdf(session_id: str, output_format: str, start_page: int = 0) -> Non
         status = get_session_status(session_id)
         
         # Get file path
-        pdf_path = os.path.join(UPLOAD_FOLDER, f"{session_id}.pdf")
+        pdf_path = session_store.get_upload_file_path(session_id)
         
-        # Open the PDF
-        doc = fitz.open(pdf_path)
-        total_pages = len(doc)
+        # Get the page count
+        with fitz.open(pdf_path) as doc:
+            total_pages = len(doc)
         
         # Update status with total pages
         status["total_pages"] = total_pages
@@ -808,70 +1144,28 @@ def process_pdf(session_id: str, output_format: str, start_page: int = 0) -> Non
         extraction_strategy = analysis_results["suggested_strategy"]
         rtl_mode = analysis_results["has_rtl_text"]
         
-        # Process each page
-        for page_num in range(start_page, total_pages):
+        # Process the pages in parallel, collecting results by page number
+        page_results = {}
+        next_page = start_page
+        for page_num, page_result in iter_page_results(pdf_path, range(start_page, total_pages), extraction_strategy):
+            page_results[page_num] = page_result
+            
+            # Progress only counts the pages completed without gaps, so that
+            # resuming from current_page never skips a page
+            while next_page in page_results:
+                next_page += 1
+            status = update_progress(session_id, next_page, total_pages)
+            
             # Check if paused
-            status = get_session_status(session_id)
             if status["status"] != ConversionStatus.PROCESSING:
                 return
-            
-            # Get the page
-            page = doc[page_num]
-            
-            # Use the best strategy based on analysis
-            if extraction_strategy == "plumber" or extraction_strategy == "rtl_optimized":
-                # PDFPlumber is best for tables and RTL content
-                plumber_tables = extract_tables_with_pdfplumber(pdf_path, page_num)
-                if plumber_tables:
-                    logger.info(f"Found {len(plumber_tables)} tables using pdfplumber on page {page_num+1}")
-                    dataframes.extend(plumber_tables)
-                    # Skip other extraction methods if pdfplumber found tables
-                    update_progress(session_id, page_num + 1, total_pages)
-                    time.sleep(0.1)
-                    continue
-            
-            # If PDFPlumber didn't find tables or wasn't the chosen strategy, try structured table extraction
-            structured_table = extract_structured_table(page)
-            
-            if structured_table and len(structured_table) > 1:
-                # We found a structured table using layout analysis
-                logger.info(f"Found structured table on page {page_num+1} with {len(structured_table)} rows")
-                
-                # Merge multiline entries if needed
-                merged_table = merge_multiline_entries(structured_table)
-                structured_table_data.extend(merged_table)
-            else:
-                # Fall back to text-based extraction
-                # Extract text from page
-                text = extract_text_from_page(page)
-                
-                # If text is very short or empty, try OCR
-                if len(text.strip()) < 50 or extraction_strategy == "ocr":
-                    # Check if page has images
-                    image_list = page.get_images(full=True)
-                    
-                    if image_list:
-                        for img_index, img_info in enumerate(image_list):
-                            xref = img_info[0]
-                            base_image = doc.extract_image(xref)
-                            image_bytes = base_image["image"]
-                            
-                            # Extract text from image using OCR
-                            ocr_text = extract_text_from_image(image_bytes)
-                            text += "\n" + ocr_text
-                
-                # Preprocess text with proper RTL handling
-                text = preprocess_text(text)
-                
-                # Detect tables
-                tables = detect_tables_in_text(text)
-                all_tables.extend(tables)
-            
-            # Update progress
-            update_progress(session_id, page_num + 1, total_pages)
-            
-            # Add a small sleep to allow for pause functionality
-            time.sleep(0.1)
+        
+        # Combine the page results in page order
+        for page_num in sorted(page_results):
+            page_result = page_results[page_num]
+            dataframes.extend(page_result["dataframes"])
+            structured_table_data.extend(page_result["structured_rows"])
+            all_tables.extend(page_result["text_tables"])
         
         # Process all detected data
         df = None
@@ -883,13 +1177,15 @@ def process_pdf(session_id: str, output_format: str, start_page: int = 0) -> Non
                 df = dataframes[0]
             else:
                 # Find the DataFrame with the most columns and rows as the main one
-                main_df = max(dataframes, key=lambda x: x.shape[0] * x.shape[1])
+                sizes = np.fromiter((d.size for d in dataframes), dtype=np.int64, count=len(dataframes))
+                main_df = dataframes[int(sizes.argmax())]
                 df = main_df
                 
                 # Try to append other dataframes if they have compatible structure
-                for other_df in dataframes:
-                    if other_df is not main_df and other_df.shape[1] == main_df.shape[1]:
-                        df = pd.concat([df, other_df], ignore_index=True)
+                compatible = [other_df for other_df in dataframes
+                              if other_df is not main_df and other_df.shape[1] == main_df.shape[1]]
+                if compatible:
+                    df = pd.concat([main_df] + compatible, ignore_index=True, copy=False)
         
         # If no dataframes from pdfplumber, try structured tables
         elif structured_table_data:
@@ -915,58 +1211,56 @@ def process_pdf(session_id: str, output_format: str, start_page: int = 0) -> Non
                         # Sanitize column names
                         header = [sanitize_column_name(col) for col in header]
                         
-                        # Ensure data rows have consistent columns
-                        padded_data_rows = []
-                        for row in data_rows:
-                            if len(row) < max_cols:
-                                padded_data_rows.append(row + [''] * (max_cols - len(row)))
-                            else:
-                                padded_data_rows.append(row[:max_cols])
-                        
                         # Create DataFrame with explicit column specification
                         try:
                             # Check that we have reasonable data
-                            if padded_data_rows and all(isinstance(row, list) for row in padded_data_rows):
-                                # Convert entries with appropriate data types
-                                clean_data_rows = []
-                                for row in padded_data_rows:
-                                    clean_row = []
-                                    for cell in row:
-                                        if cell is None:
-                                            clean_row.append('')
-                                        else:
-                                            cell_str = str(cell)
-                                            if is_numeric(cell_str):
-                                                try:
-                                                    # Try to convert to float or int
-                                                    if '.' in cell_str:
-                                                        clean_row.append(float(cell_str.replace(',', '')))
-                                                    else:
-                                                        clean_row.append(int(cell_str.replace(',', '')))
-                                                except ValueError:
-                                                    # If conversion fails, keep as string with RTL handling
-                                                    if is_rtl_text(cell_str):
-                                                        clean_row.append(fix_rtl_text(cell_str))
-                                                    else:
-                                                        clean_row.append(cell_str)
-                                            elif is_rtl_text(cell_str):
-                                                clean_row.append(fix_rtl_text(cell_str))
-                                            else:
-                                                clean_row.append(cell_str)
-                                    clean_data_rows.append(clean_row)
+                            if data_rows and all(isinstance(row, list) for row in data_rows):
+                                # Duplicate column names can't be told apart by the
+                                # processing below, so such a table is not used
+                                if len(set(header)) < len(header):
+                                    raise ValueError("duplicate column names in structured table")
+                                
+                                # Convert entries with appropriate data types, working on
+                                # the whole table as a 2-D object array. The rows are
+                                # copied straight into it, padded with empty strings,
+                                # without building an intermediate padded copy
+                                cells = np.full((len(data_rows), max_cols), '', dtype=object)
+                                for i, row in enumerate(data_rows):
+                                    row = row[:max_cols]
+                                    cells[i, :len(row)] = row
+                                cells[np.equal(cells, None)] = ''
+                                cells = np.frompyfunc(str, 1, 1)(cells)
+                                # Only cells containing a digit can parse as numbers, so the
+                                # plain text cells skip parse_number and its exception path
+                                has_digit = pd.Series(cells.ravel(), dtype=object).str.contains(r'\d')
+                                has_digit = has_digit.to_numpy(dtype=bool).reshape(cells.shape)
+                                values = cells.copy()
+                                values[has_digit] = np.frompyfunc(parse_number, 1, 1)(cells[has_digit])
                                 
-                                # Create the DataFrame with proper column specification
-                                df = pd.DataFrame(clean_data_rows, columns=header)
+                                # Cells that aren't numbers (or failed to convert) stay
+                                # strings, with RTL handling
+                                is_text = np.frompyfunc(isinstance, 2, 1)(values, str).astype(bool)
+                                is_rtl = np.zeros(values.shape, dtype=bool)
+                                is_rtl[is_text] = rtl_mask(cells[is_text])
+                                values[is_rtl] = np.frompyfunc(fix_rtl_text, 1, 1)(cells[is_rtl])
                                 
-                                # Convert numeric columns to appropriate types
-                                for col in df.columns:
-                                    if df[col].dtype == 'object':  # Only process string columns
-                                        # Check if at least 70% of non-empty values are numeric
-                                        non_empty = df[col].astype(str).str.strip() != ''
-                                        if non_empty.sum() > 0:
-                                            numeric_values = df[col][non_empty].apply(lambda x: is_numeric(str(x)))
-                                            if numeric_values.sum() / len(numeric_values) >= 0.7:
-                                                df[col] = pd.to_numeric(df[col], errors='coerce')
+                                non_empty = np.ones(values.shape, dtype=bool)
+                                non_empty[is_text] = np.frompyfunc(str.strip, 1, 1)(values[is_text]).astype(bool)
+                                numeric = ~is_text
+                                text_to_check = is_text & non_empty
+                                numeric[text_to_check] = numeric_cells(pd.Series(values[text_to_check], dtype=object)).to_numpy()
+                                non_empty_counts = non_empty.sum(axis=0)
+                                numeric_counts = (numeric & non_empty).sum(axis=0)
+                                
+                                # Create the DataFrame in one go, with columns that are at
+                                # least 70% numeric (of non-empty values) converted to numbers
+                                df = pd.DataFrame({
+                                    j: (pd.to_numeric(pd.Series(values[:, j].tolist()), errors='coerce')
+                                        if non_empty_counts[j] and numeric_counts[j] / non_empty_counts[j] >= 0.7
+                                        else values[:, j].tolist())
+                                    for j in range(max_cols)
+                                })
+                                df.columns = header
                             else:
                                 logger.warning("Invalid data format in structured_table_data")
                                 df = pd.DataFrame()
@@ -999,16 +1293,16 @@ def process_pdf(session_id: str, output_format: str, start_page: int = 0) -> Non
         
         # Handle RTL text in column names
         if rtl_mode:
-            new_columns = []
-            for col in df.columns:
-                if is_rtl_text(str(col)):
-                    new_columns.append(fix_rtl_text(str(col)))
-                else:
-                    new_columns.append(str(col))
-            df.columns = new_columns
+            new_columns = df.columns.astype(str).to_numpy(dtype=object)
+            is_rtl = rtl_mask(new_columns)
+            new_columns[is_rtl] = [fix_rtl_text(col) for col in new_columns[is_rtl]]
+            df.columns = new_columns.tolist()
         
-        # Generate preview
-        preview_data = df.head(10).to_dict(orient='records') if not df.empty else []
+        # Generate preview - integers too large for JSON are shown as strings
+        preview_data = [
+            {col: preview_value(value) for col, value in record.items()}
+            for record in df.head(10).to_dict(orient='records')
+        ] if not df.empty else []
         columns = df.columns.tolist()
         
         # Save output file
@@ -1022,28 +1316,30 @@ def process_pdf(session_id: str, output_format: str, start_page: int = 0) -> Non
             csv_dialect = 'excel'  # Default dialect
             csv_quoting = 1  # Default csv.QUOTE_ALL
             
-            # Use tab delimiter if content might contain commas
-            if df.astype(str).apply(lambda x: x.str.contains(',', na=False)).any().any():
+            # Only text columns can hold a comma or a newline - they are
+            # converted to strings once, for both the delimiter scan and the
+            # newline cleanup below
+            str_views = {col: df[col].astype(str) for col in df.columns if df[col].dtype == 'object'}
+            
+            # Use tab delimiter if content might contain commas. The scan
+            # stops at the first column with one
+            if any(view.str.contains(',', regex=False).any() for view in str_views.values()):
                 csv_delimiter = '\t'
             else:
                 csv_delimiter = ','
             
-            # 2. Ensure numbers remain as numbers
-            # Create a copy to avoid modifying the original DataFrame during processing
-            df_csv = df.copy()
-            
-            # 3. Handle complex cell contents (e.g., cells with newlines, quotes)
-            for col in df_csv.columns:
-                # If it's a string column and contains newlines, quotes, etc., handle specially
-                if df_csv[col].dtype == 'object':
-                    # Replace newlines with spaces in string columns
-                    df_csv[col] = df_csv[col].astype(str).apply(
-                        lambda x: x.replace('\n', ' ').replace('\r', ' ') if pd.notna(x) else x
-                    )
+            # 2. Handle complex cell contents (e.g., cells with newlines, quotes).
+            # The preview has already been taken, so string columns are
+            # rewritten in place rather than on a copy of the whole frame;
+            # numeric columns are left alone so numbers remain numbers
+            for col, view in str_views.items():
+                # Replace newlines with spaces
+                # (missing cells stay missing rather than becoming "nan")
+                df[col] = view.str.translate(CSV_NEWLINE_TRANSLATION).where(df[col].notna())
             
-            # 4. Write the CSV with enhanced settings
+            # 3. Write the CSV with enhanced settings
             try:
-                df_csv.to_csv(
+                df.to_csv(
                     output_path, 
                     index=False, 
                     sep=csv_delimiter,
@@ -1052,7 +1348,7 @@ def process_pdf(session_id: str, output_format: str, start_page: int = 0) -> Non
                     quotechar='"',
                     date_format='%Y-%m-%d',  # ISO format for dates
                     doublequote=True,        # Handle quotes properly
-                    line_terminator='\r\n'   # Windows line endings for better Excel compatibility
+                    lineterminator='\r\n'    # Windows line endings for better Excel compatibility
                 )
                 
                 # Verify the CSV file was saved correctly
@@ -1067,61 +1363,66 @@ def process_pdf(session_id: str, output_format: str, start_page: int = 0) -> Non
                 df.to_csv(output_path, index=False, encoding='utf-8-sig')
                 
         else:  # xlsx
-            # For Excel, use openpyxl engine with additional formatting
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Data')
-                
-                # Access workbook and worksheet
+            # For Excel, stream the sheet with xlsxwriter in constant_memory mode,
+            # so only the current row is held in memory. Rows have to be written
+            # in order in this mode, which df.to_excel (column by column) does not
+            # do, so the cells are written here directly.
+            with pd.ExcelWriter(
+                output_path,
+                engine='xlsxwriter',
+                engine_kwargs={'options': {'constant_memory': True}}
+            ) as writer:
                 workbook = writer.book
-                worksheet = writer.sheets['Data']
+                worksheet = workbook.add_worksheet('Data')
                 
-                # Apply formatting to make it more readable
-                # Auto-adjust column widths
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
+                # Formats are created once and shared by every cell
+                header_format = workbook.add_format({
+                    'bold': True,
+                    'font_size': 12,
+                    'bg_color': '#E0E0E0',
+                    'border': 1,
+                    'align': 'center',
+                    'valign': 'vcenter'
+                })
+                data_format = workbook.add_format({'border': 1})
+                numeric_format = workbook.add_format({'border': 1, 'align': 'right'})
+                
+                # Auto-adjust column widths, measured on the DataFrame
+                # (missing values are written as empty cells)
+                for i, col in enumerate(df.columns):
+                    column = df.iloc[:, i]
+                    max_length = column.astype(str).str.len().where(column.notna(), 0).max()
+                    max_length = max(len(str(col)), 0 if pd.isna(max_length) else int(max_length))
                     # Add some padding
                     adjusted_width = (max_length + 2) * 1.2
-                    worksheet.column_dimensions[column_letter].width = min(adjusted_width, 50)
+                    worksheet.set_column(i, i, min(adjusted_width, 50))
                 
-                # Add borders and formatting to header
-                from openpyxl.styles import Font, Border, Side, Alignment, PatternFill
+                # Header row
+                for i, col in enumerate(df.columns):
+                    worksheet.write_string(0, i, str(col), header_format)
                 
-                header_font = Font(bold=True, size=12)
-                header_fill = PatternFill(start_color="E0E0E0", end_color="E0E0E0", fill_type="solid")
-                border = Border(
-                    left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin')
-                )
-                
-                # Apply styles to header row
-                for cell in worksheet[1]:
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                
-                # Apply borders to all cells with data
-                data_rows = list(worksheet.rows)[1:]  # Skip header
-                for row in data_rows:
-                    for cell in row:
-                        cell.border = Border(
-                            left=Side(style='thin'),
-                            right=Side(style='thin'),
-                            top=Side(style='thin'),
-                            bottom=Side(style='thin')
-                        )
-                        # Center numeric values
-                        if isinstance(cell.value, (int, float)):
-                            cell.alignment = Alignment(horizontal='right')
+                # Data rows, in order - numbers are right aligned
+                for row_num, values in enumerate(df.itertuples(index=False, name=None), start=1):
+                    for i, value in enumerate(values):
+                        if isinstance(value, (bool, np.bool_)):
+                            worksheet.write_boolean(row_num, i, bool(value), numeric_format)
+                        elif isinstance(value, (float, np.floating)):
+                            if np.isnan(value):
+                                worksheet.write_blank(row_num, i, None, data_format)
+                            elif np.isinf(value):
+                                worksheet.write_string(row_num, i, 'inf' if value > 0 else '-inf', data_format)
+                            else:
+                                worksheet.write_number(row_num, i, value, numeric_format)
+                        elif isinstance(value, (int, np.integer)):
+                            # Python ints can be too large for an Excel (double) number
+                            try:
+                                worksheet.write_number(row_num, i, float(value), numeric_format)
+                            except OverflowError:
+                                worksheet.write_string(row_num, i, str(value), numeric_format)
+                        elif value is None or value is pd.NA or value is pd.NaT or value == '':
+                            worksheet.write_blank(row_num, i, None, data_format)
+                        else:
+                            worksheet.write_string(row_num, i, str(value), data_format)
         
         # Update status
         status = get_session_status(session_id)
@@ -0,0 +1,185 @@
+import os
+import re
+import time
+import logging
+import orjson
+import threading
+import concurrent.futures
+from typing import Callable, Dict, List, Optional
+from server.config import TEMP_FOLDER, UPLOAD_FOLDER
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Number of threads used to read checkpoints when hydrating the store
+LOAD_WORKERS = 8
+
+# Preview records may be keyed by integer column labels and hold numpy scalars
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# In-process session state, keyed by session ID.
+# The JSON files in TEMP_FOLDER are only a durability checkpoint; the
+# dictionary below is the source of truth while the server is running.
+SESSIONS: Dict[str, dict] = {}
+
+# Guards SESSIONS - the converter updates it from background threads
+# while the endpoints read it from the event loop
+RLock = threading.RLock()
+
+# Progress updates while processing are checkpointed at most this often (seconds);
+# every other state transition is written immediately
+FLUSH_INTERVAL = 0.25
+DEBOUNCED_STATES = frozenset({"processing"})
+
+# Time of the last checkpoint per session, and sessions with unwritten updates
+_last_flush_ts: Dict[str, float] = {}
+_unflushed: Dict[str, bool] = {}
+
+# Session IDs are uuid4 hex strings; the hyphenated form is still accepted
+# for sessions created before the switch
+SESSION_ID_RE = re.compile(
+    r"[0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+)
+
+def is_valid_session_id(session_id: str) -> bool:
+    """Check that a session ID is well formed"""
+    return SESSION_ID_RE.fullmatch(session_id) is not None
+
+def get_session_file_path(session_id: str) -> str:
+    """Get the path to the session status file"""
+    return f"{TEMP_FOLDER}/{session_id}.json"
+
+def get_upload_file_path(session_id: str) -> str:
+    """Get the path to the uploaded PDF of a session"""
+    return f"{UPLOAD_FOLDER}/{session_id}.pdf"
+
+def _flush(session_id: str, status: dict) -> None:
+    """
+    Write a session status checkpoint to its JSON file
+
+    The checkpoint is written to a temporary file and swapped into place with
+    os.replace, so readers never observe a partially written file
+    """
+    path = get_session_file_path(session_id)
+    # Per-thread temporary name so concurrent flushes of one session don't collide
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        # Raw descriptor I/O - one write(2) for the whole blob, no buffered file object
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, orjson.dumps(status, option=ORJSON_OPTIONS))
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"Error saving session {session_id}: {str(e)}")
+
+def get(session_id: str) -> dict:
+    """
+    Get a copy of the session status
+
+    Raises KeyError if the session does not exist
+    """
+    with RLock:
+        return dict(SESSIONS[session_id])
+
+def _store(session_id: str, status: dict) -> bool:
+    """
+    Store the session status - the caller must hold RLock
+
+    Returns True if the status should be checkpointed now. Checkpoints of
+    in-progress updates are debounced to one per FLUSH_INTERVAL; the latest
+    state is written by the next non-debounced save or by flush_all()
+    """
+    now = time.monotonic()
+    SESSIONS[session_id] = status
+    if (status.get("status") in DEBOUNCED_STATES
+            and now - _last_flush_ts.get(session_id, 0.0) < FLUSH_INTERVAL):
+        _unflushed[session_id] = True
+        return False
+    _last_flush_ts[session_id] = now
+    _unflushed.pop(session_id, None)
+    return True
+
+def set(session_id: str, status: dict) -> None:
+    """Store the session status and checkpoint it to disk"""
+    status = dict(status)
+    with RLock:
+        flush = _store(session_id, status)
+    if flush:
+        _flush(session_id, status)
+
+def update(session_id: str, fn: Callable[[dict], Optional[dict]]) -> dict:
+    """
+    Read, modify and store a session status as one atomic step
+
+    fn receives a copy of the current status and returns the new status, or
+    None to leave it unchanged. Returns a copy of the resulting status.
+
+    Raises KeyError if the session does not exist; exceptions raised by fn
+    propagate and leave the status unchanged
+    """
+    with RLock:
+        status = fn(dict(SESSIONS[session_id]))
+        if status is None:
+            return dict(SESSIONS[session_id])
+        status = dict(status)
+        flush = _store(session_id, status)
+    if flush:
+        _flush(session_id, status)
+    return dict(status)
+
+def flush_all() -> None:
+    """Checkpoint every session that has updates not yet written to disk"""
+    with RLock:
+        pending = [(session_id, SESSIONS[session_id]) for session_id in _unflushed]
+        _unflushed.clear()
+    for session_id, status in pending:
+        _flush(session_id, status)
+
+def list_all() -> List[dict]:
+    """Get a copy of every known session status"""
+    with RLock:
+        return [dict(status) for status in SESSIONS.values()]
+
+def _load_file(path: str) -> dict:
+    """Parse a single session status checkpoint"""
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+def load() -> int:
+    """
+    Hydrate SESSIONS from the JSON checkpoints in TEMP_FOLDER
+
+    Returns the number of sessions loaded
+    """
+    try:
+        # A single scandir pass - DirEntry objects need no extra stat calls
+        with os.scandir(TEMP_FOLDER) as it:
+            entries = [entry for entry in it if entry.name.endswith(".json")]
+    except FileNotFoundError:
+        return 0
+
+    if not entries:
+        return 0
+
+    # Overlap the file reads across a small thread pool
+    loaded = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(LOAD_WORKERS, len(entries))) as executor:
+        futures = {
+            executor.submit(_load_file, entry.path): os.path.splitext(entry.name)[0]
+            for entry in entries
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                loaded[futures[future]] = future.result()
+            except Exception:
+                # Skip invalid or corrupt status files
+                continue
+
+    with RLock:
+        # Sessions created since startup take precedence over checkpoints
+        for session_id, status in loaded.items():
+            SESSIONS.setdefault(session_id, status)
+
+    return len(loaded)